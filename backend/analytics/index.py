@@ -0,0 +1,143 @@
+import json
+import os
+import psycopg2
+from psycopg2.extras import RealDictCursor
+from typing import Dict, Any, Optional
+from tracing import capture_trace
+
+REFRESH_LOCK_ID = 28001
+STALE_AFTER_SECONDS = 300
+
+@capture_trace('analytics')
+def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    '''
+    API аналитики нагрузки юристов: открытые и просроченные задачи, задержка выполнения,
+    активные дела. GET - данные из материализованного представления, POST - его обновление.
+    Если данные старше STALE_AFTER_SECONDS, GET сначала обновляет представление (одновременно - только один запрос,
+    остальные отдают текущие данные), так что выборка не устаревает, даже если POST никто не вызывает
+    '''
+    method: str = event.get('httpMethod', 'GET')
+    
+    if method == 'OPTIONS':
+        return {
+            'statusCode': 200,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',
+                'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
+                'Access-Control-Allow-Headers': 'Content-Type',
+                'Access-Control-Max-Age': '86400'
+            },
+            'body': '',
+            'isBase64Encoded': False
+        }
+    
+    conn = psycopg2.connect(os.environ['DATABASE_URL'])
+    
+    try:
+        if method == 'GET':
+            params = event.get('queryStringParameters') or {}
+            user_id = params.get('user_id')
+            
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                freshness = get_freshness(cur)
+                if freshness['age_seconds'] is None or freshness['age_seconds'] > STALE_AFTER_SECONDS:
+                    if refresh_workload(cur, STALE_AFTER_SECONDS) is not None:
+                        conn.commit()
+                        freshness = get_freshness(cur)
+                    else:
+                        conn.rollback()
+                
+                if user_id:
+                    cur.execute('SELECT * FROM lawyer_workload WHERE user_id = %s', (user_id,))
+                else:
+                    cur.execute('''
+                        SELECT * FROM lawyer_workload
+                        ORDER BY overdue_tasks DESC, open_tasks DESC, full_name
+                    ''')
+                rows = [dict(row) for row in cur.fetchall()]
+                
+                return {
+                    'statusCode': 200,
+                    'headers': {
+                        'Content-Type': 'application/json',
+                        'Access-Control-Allow-Origin': '*'
+                    },
+                    'body': json.dumps({
+                        'refreshed_at': freshness['refreshed_at'],
+                        'age_seconds': freshness['age_seconds'],
+                        'lawyers': rows
+                    }, default=str),
+                    'isBase64Encoded': False
+                }
+        
+        elif method == 'POST':
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                refreshed_at = refresh_workload(cur)
+                if refreshed_at is None:
+                    return {
+                        'statusCode': 409,
+                        'headers': {
+                            'Content-Type': 'application/json',
+                            'Access-Control-Allow-Origin': '*'
+                        },
+                        'body': json.dumps({'error': 'Обновление уже выполняется'}),
+                        'isBase64Encoded': False
+                    }
+                
+                conn.commit()
+                
+                return {
+                    'statusCode': 200,
+                    'headers': {
+                        'Content-Type': 'application/json',
+                        'Access-Control-Allow-Origin': '*'
+                    },
+                    'body': json.dumps({'refreshed_at': refreshed_at, 'message': 'Аналитика обновлена'}, default=str),
+                    'isBase64Encoded': False
+                }
+        
+        return {
+            'statusCode': 405,
+            'headers': {'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': 'Method not allowed'}),
+            'isBase64Encoded': False
+        }
+        
+    finally:
+        conn.close()
+
+
+def get_freshness(cur) -> Dict[str, Any]:
+    cur.execute('''
+        SELECT 
+            refreshed_at,
+            EXTRACT(EPOCH FROM CURRENT_TIMESTAMP - refreshed_at) as age_seconds
+        FROM materialized_view_refreshes
+        WHERE view_name = 'lawyer_workload'
+    ''')
+    return cur.fetchone() or {'refreshed_at': None, 'age_seconds': None}
+
+
+def refresh_workload(cur, max_age_seconds: Optional[float] = None) -> Optional[Any]:
+    '''
+    Обновляет lawyer_workload и время обновления в текущей транзакции (коммит - за вызывающим).
+    Возвращает None, если обновление уже выполняет другой запрос. С max_age_seconds обновление
+    пропускается, если пока ждали блокировку, данные уже освежил кто-то другой
+    '''
+    cur.execute('SELECT pg_try_advisory_xact_lock(%s) as locked', (REFRESH_LOCK_ID,))
+    if not cur.fetchone()['locked']:
+        return None
+    
+    if max_age_seconds is not None:
+        freshness = get_freshness(cur)
+        if freshness['age_seconds'] is not None and freshness['age_seconds'] <= max_age_seconds:
+            return freshness['refreshed_at']
+    
+    cur.execute('REFRESH MATERIALIZED VIEW CONCURRENTLY lawyer_workload')
+    cur.execute('''
+        INSERT INTO materialized_view_refreshes (view_name, refreshed_at)
+        VALUES ('lawyer_workload', CURRENT_TIMESTAMP)
+        ON CONFLICT (view_name) DO UPDATE SET refreshed_at = EXCLUDED.refreshed_at
+        RETURNING refreshed_at
+    ''')
+    return cur.fetchone()['refreshed_at']
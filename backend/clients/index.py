@@ -2,12 +2,37 @@ import json
 import os
 import psycopg2
 from psycopg2.extras import RealDictCursor
-from typing import Dict, Any
+from typing import Dict, Any, List, Tuple
+from tracing import capture_trace
 
+NAME_SIMILARITY_THRESHOLD = 0.6
+SIMILAR_MATCHES_LIMIT = 10
+NEAR_DUPLICATES_LIMIT = 500
+MAX_NEAR_DUPLICATES_LIMIT = 5000
+
+CLIENT_FIELDS = '''
+    id, type, full_name, company_name, inn, ogrn, passport_series_number, created_at
+'''
+
+EXACT_KEYS = ('inn', 'ogrn', 'passport_series_number')
+EXACT_KEYS_BY_TYPE = {
+    'физическое': ('passport_series_number',),
+    'юридическое': ('inn', 'ogrn')
+}
+
+MERGE_TEXT_FIELDS = (
+    'full_name', 'company_name', 'address', 'passport_series_number',
+    'inn', 'kpp', 'ogrn', 'legal_address'
+)
+
+CONTACT_LISTS = ('phones', 'emails')
+
+@capture_trace('clients')
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
     API для работы с клиентами: получение списка, создание, обновление
-    Поддерживает физических и юридических лиц
+    Поддерживает физических и юридических лиц, проверку дублей при создании,
+    пакетный поиск дублей (GET ?action=duplicates) и слияние (POST ?action=merge)
     '''
     method: str = event.get('httpMethod', 'GET')
     
@@ -27,7 +52,37 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     conn = psycopg2.connect(os.environ['DATABASE_URL'])
     
     try:
-        if method == 'GET':
+        params = event.get('queryStringParameters') or {}
+        
+        if method == 'GET' and params.get('action') == 'duplicates':
+            try:
+                limit = int(params.get('limit', NEAR_DUPLICATES_LIMIT))
+            except ValueError:
+                return {
+                    'statusCode': 400,
+                    'headers': {
+                        'Content-Type': 'application/json',
+                        'Access-Control-Allow-Origin': '*'
+                    },
+                    'body': json.dumps({'error': 'Параметр limit должен быть числом'}),
+                    'isBase64Encoded': False
+                }
+            limit = min(max(limit, 1), MAX_NEAR_DUPLICATES_LIMIT)
+            
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                result = find_all_duplicates(cur, limit)
+                
+                return {
+                    'statusCode': 200,
+                    'headers': {
+                        'Content-Type': 'application/json',
+                        'Access-Control-Allow-Origin': '*'
+                    },
+                    'body': json.dumps(result, default=str),
+                    'isBase64Encoded': False
+                }
+        
+        elif method == 'GET':
             with conn.cursor(cursor_factory=RealDictCursor) as cur:
                 query = '''
                     SELECT 
@@ -49,10 +104,56 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                     'isBase64Encoded': False
                 }
         
+        elif method == 'POST' and params.get('action') == 'merge':
+            body = json.loads(event.get('body', '{}'))
+            
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                status, result = merge_clients(cur, body.get('target_id'), body.get('source_id'))
+                if status != 200:
+                    conn.rollback()
+                    return {
+                        'statusCode': status,
+                        'headers': {
+                            'Content-Type': 'application/json',
+                            'Access-Control-Allow-Origin': '*'
+                        },
+                        'body': json.dumps(result),
+                        'isBase64Encoded': False
+                    }
+                conn.commit()
+                
+                return {
+                    'statusCode': 200,
+                    'headers': {
+                        'Content-Type': 'application/json',
+                        'Access-Control-Allow-Origin': '*'
+                    },
+                    'body': json.dumps({**result, 'message': 'Клиенты объединены'}),
+                    'isBase64Encoded': False
+                }
+        
         elif method == 'POST':
             body = json.loads(event.get('body', '{}'))
             client_type = body.get('type')
             
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                lock_client_keys(cur, body)
+                exact, similar = find_duplicates(cur, body)
+                if exact or (similar and not body.get('force')):
+                    return {
+                        'statusCode': 409,
+                        'headers': {
+                            'Content-Type': 'application/json',
+                            'Access-Control-Allow-Origin': '*'
+                        },
+                        'body': json.dumps({
+                            'error': 'Похожий клиент уже существует',
+                            'exact_matches': [dict(row) for row in exact],
+                            'similar_matches': [dict(row) for row in similar]
+                        }, default=str),
+                        'isBase64Encoded': False
+                    }
+            
             with conn.cursor() as cur:
                 if client_type == 'физическое':
                     cur.execute('''
@@ -103,6 +204,24 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             client_id = body.get('id')
             client_type = body.get('type')
             
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                lock_client_keys(cur, body)
+                exact, _ = find_duplicates(cur, body, exclude_id=client_id, check_names=False)
+                if exact:
+                    return {
+                        'statusCode': 409,
+                        'headers': {
+                            'Content-Type': 'application/json',
+                            'Access-Control-Allow-Origin': '*'
+                        },
+                        'body': json.dumps({
+                            'error': 'Клиент с такими реквизитами уже существует',
+                            'exact_matches': [dict(row) for row in exact],
+                            'similar_matches': []
+                        }, default=str),
+                        'isBase64Encoded': False
+                    }
+            
             with conn.cursor() as cur:
                 if client_type == 'физическое':
                     cur.execute('''
@@ -156,3 +275,180 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         
     finally:
         conn.close()
+
+
+def lock_client_keys(cur, body: Dict[str, Any]) -> None:
+    '''
+    Транзакционные advisory-блокировки по нормализованным реквизитам и имени клиента:
+    одновременные создания одного и того же клиента выполняют проверку дублей по очереди
+    '''
+    client_type = body.get('type')
+    name = body.get('full_name') if client_type == 'физическое' else body.get('company_name')
+    
+    keys = [
+        (f'{key}:', 'client_digits_key(%s)', body[key])
+        for key in EXACT_KEYS_BY_TYPE.get(client_type, ())
+        if body.get(key)
+    ]
+    if name:
+        keys.append((f'{client_type}:name:', 'client_name_key(%s)', name))
+    
+    for prefix, expression, value in sorted(keys):
+        cur.execute(f'SELECT pg_advisory_xact_lock(hashtext(%s || {expression}))', (prefix, value))
+
+
+def find_duplicates(cur, body: Dict[str, Any], exclude_id: Any = None,
+                    check_names: bool = True) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    '''
+    Ищет дубли клиента того же типа: точные совпадения реквизитов по частичным индексам
+    и похожие имена по триграммному индексу. exclude_id - сам клиент при обновлении
+    '''
+    client_type = body.get('type')
+    exclude = ' AND id <> %s' if exclude_id else ''
+    
+    branches = []
+    values = []
+    for key in EXACT_KEYS_BY_TYPE.get(client_type, ()):
+        if body.get(key):
+            branches.append(f'''
+                SELECT {CLIENT_FIELDS}, '{key}' as match
+                FROM clients
+                WHERE {key} IS NOT NULL AND client_digits_key({key}) = client_digits_key(%s){exclude}
+            ''')
+            values.append(body[key])
+            if exclude_id:
+                values.append(exclude_id)
+    
+    exact = []
+    if branches:
+        cur.execute(' UNION ALL '.join(branches), values)
+        exact = cur.fetchall()
+    
+    name = body.get('full_name') if client_type == 'физическое' else body.get('company_name')
+    similar = []
+    if check_names and name:
+        cur.execute('SET LOCAL pg_trgm.similarity_threshold = %s', (NAME_SIMILARITY_THRESHOLD,))
+        cur.execute(f'''
+            SELECT 
+                {CLIENT_FIELDS},
+                similarity(client_name_key(COALESCE(full_name, company_name)), client_name_key(%s)) as similarity
+            FROM clients
+            WHERE client_name_key(COALESCE(full_name, company_name)) %% client_name_key(%s)
+                AND type = %s{exclude}
+            ORDER BY similarity DESC
+            LIMIT %s
+        ''', (name, name, client_type, *([exclude_id] if exclude_id else []), SIMILAR_MATCHES_LIMIT))
+        similar = cur.fetchall()
+    
+    return exact, similar
+
+
+def find_all_duplicates(cur, limit: int) -> Dict[str, Any]:
+    '''
+    Пакетный поиск дублей по всей таблице: группы с одинаковыми реквизитами
+    и пары клиентов с похожими именами
+    '''
+    cur.execute(' UNION ALL '.join(f'''
+        SELECT '{key}' as match, client_digits_key({key}) as value, array_agg(id ORDER BY id) as client_ids
+        FROM clients
+        WHERE {key} IS NOT NULL AND client_digits_key({key}) IS NOT NULL
+        GROUP BY client_digits_key({key})
+        HAVING COUNT(*) > 1
+    ''' for key in EXACT_KEYS))
+    exact_groups = cur.fetchall()
+    
+    cur.execute('SET LOCAL pg_trgm.similarity_threshold = %s', (NAME_SIMILARITY_THRESHOLD,))
+    cur.execute('''
+        SELECT 
+            a.id as client_id,
+            b.id as duplicate_id,
+            similarity(
+                client_name_key(COALESCE(a.full_name, a.company_name)),
+                client_name_key(COALESCE(b.full_name, b.company_name))
+            ) as similarity
+        FROM clients a
+        JOIN clients b
+            ON client_name_key(COALESCE(b.full_name, b.company_name)) %% client_name_key(COALESCE(a.full_name, a.company_name))
+            AND a.id < b.id
+            AND a.type = b.type
+        ORDER BY similarity DESC
+        LIMIT %s
+    ''', (limit,))
+    similar_pairs = cur.fetchall()
+    
+    return {
+        'exact_groups': [dict(row) for row in exact_groups],
+        'similar_pairs': [dict(row) for row in similar_pairs]
+    }
+
+
+def merge_clients(cur, target_id: Any, source_id: Any) -> Tuple[int, Dict[str, Any]]:
+    '''
+    Переносит дела и оплаты клиента source на target, дополняет пустые поля target
+    данными source, объединяет телефоны и email и удаляет source.
+    Возвращает HTTP-статус и тело ответа
+    '''
+    try:
+        target_id, source_id = int(target_id), int(source_id)
+    except (TypeError, ValueError):
+        return 400, {'error': 'target_id и source_id должны быть числами'}
+    if target_id == source_id:
+        return 400, {'error': 'Требуются разные target_id и source_id'}
+    
+    cur.execute(
+        'SELECT id, type FROM clients WHERE id IN (%s, %s) ORDER BY id FOR UPDATE',
+        (target_id, source_id)
+    )
+    rows = cur.fetchall()
+    if len(rows) != 2:
+        return 404, {'error': 'Клиент не найден'}
+    if rows[0]['type'] != rows[1]['type']:
+        return 400, {'error': 'Нельзя объединить клиентов разного типа'}
+    
+    cur.execute('UPDATE cases SET client_id = %s WHERE client_id = %s', (target_id, source_id))
+    cases_moved = cur.rowcount
+    cur.execute('UPDATE payments SET client_id = %s WHERE client_id = %s', (target_id, source_id))
+    payments_moved = cur.rowcount
+    
+    assignments = [f"{field} = COALESCE(NULLIF(t.{field}, ''), s.{field})" for field in MERGE_TEXT_FIELDS]
+    assignments.append('date_of_birth = COALESCE(t.date_of_birth, s.date_of_birth)')
+    assignments.append(
+        "contact_info = COALESCE(s.contact_info, '{}'::jsonb) || COALESCE(t.contact_info, '{}'::jsonb) || "
+        f"jsonb_build_object({', '.join(_merged_contact_list(key) for key in CONTACT_LISTS)})"
+    )
+    assignments = ', '.join(assignments)
+    cur.execute(f'''
+        UPDATE clients t
+        SET {assignments}
+        FROM clients s
+        WHERE t.id = %s AND s.id = %s
+    ''', (target_id, source_id))
+    cur.execute('DELETE FROM clients WHERE id = %s', (source_id,))
+    
+    return 200, {
+        'id': target_id,
+        'merged_id': source_id,
+        'cases_moved': cases_moved,
+        'payments_moved': payments_moved
+    }
+
+
+def _merged_contact_list(key: str) -> str:
+    '''
+    SQL-выражение для пары "ключ, массив": элементы contact_info->key обоих клиентов
+    без повторов, в порядке первого появления (сначала target)
+    '''
+    def as_array(alias: str) -> str:
+        return (f"CASE WHEN jsonb_typeof({alias}.contact_info->'{key}') = 'array' "
+                f"THEN {alias}.contact_info->'{key}' ELSE '[]'::jsonb END")
+    
+    return f'''
+        '{key}', (
+            SELECT COALESCE(jsonb_agg(value ORDER BY position), '[]'::jsonb)
+            FROM (
+                SELECT value, MIN(position) as position
+                FROM jsonb_array_elements({as_array('t')} || {as_array('s')}) WITH ORDINALITY AS e(value, position)
+                GROUP BY value
+            ) merged
+        )
+    '''
@@ -0,0 +1,89 @@
+import base64
+import glob
+import json
+import os
+
+import tracing
+
+
+def test_redact_value_masks_personal_data():
+    body = {
+        'type': 'физическое',
+        'full_name': 'Петров Иван Сергеевич',
+        'address': 'г. Москва, ул. Ленина, д. 1',
+        'passport_series_number': '1234 567890',
+        'date_of_birth': '1990-01-01',
+        'contact_info': {'phones': ['+7 999 123-45-67']},
+        'company_name': None,
+        'legal_address': '',
+        'cases': [{'title': 'Иск Петрова', 'description': 'Подробности', 'result_comment': 'Готово'}],
+        'amount': 1000
+    }
+    redacted = tracing._redact_value(body)
+    text = json.dumps(redacted, ensure_ascii=False)
+
+    for value in ('Петров', 'Ленина', '1234', '1990', '+7 999', 'Иск', 'Подробности', 'Готово'):
+        assert value not in text
+    assert redacted['type'] == 'физическое'
+    assert redacted['amount'] == 1000
+    assert redacted['passport_series_number'] is None
+    assert redacted['contact_info'] == {}
+    assert redacted['full_name']
+    assert redacted['company_name'] is None
+    assert redacted['legal_address'] == ''
+
+
+def test_masked_names_keep_equality():
+    first = tracing._redact_value({'full_name': 'Петров Иван'})
+    second = tracing._redact_value([{'full_name': 'Петров Иван'}, {'full_name': 'Сидоров Петр'}])
+    assert second[0] == first
+    assert second[1] != first
+
+
+def test_file_content_is_replaced_with_zeros_of_same_size():
+    data = base64.b64encode(b'secret document').decode('ascii')
+    redacted = tracing._redact(json.dumps({'upload_id': 'u1', 'index': 0, 'data': data}), False)
+    assert base64.b64decode(json.loads(redacted)['data']) == bytes(len(b'secret document'))
+    assert base64.b64decode(tracing._redact(data, True)) == bytes(len(b'secret document'))
+
+
+def test_records_are_appended_as_whole_lines(tmp_path, monkeypatch):
+    path = str(tmp_path / 'trace.jsonl')
+    monkeypatch.setenv('TRACE_CAPTURE_PATH', path)
+
+    @tracing.capture_trace('clients')
+    def handler(event, context):
+        return {'statusCode': 201}
+
+    for _ in range(3):
+        handler({'httpMethod': 'POST', 'body': json.dumps({'full_name': 'Петров Иван'})}, None)
+
+    with open(path, encoding='utf-8') as f:
+        records = [json.loads(line) for line in f]
+    assert [record['status'] for record in records] == [201, 201, 201]
+    assert 'Петров' not in records[0]['body']
+
+
+def test_stdout_sink_prefixes_records_with_marker(capfd, monkeypatch):
+    monkeypatch.delenv('TRACE_CAPTURE_PATH', raising=False)
+    monkeypatch.setenv('TRACE_CAPTURE', '1')
+
+    @tracing.capture_trace('clients')
+    def handler(event, context):
+        return {'statusCode': 200}
+
+    handler({'httpMethod': 'GET'}, None)
+
+    line = capfd.readouterr().out.strip()
+    assert line.startswith(tracing.TRACE_MARKER)
+    assert json.loads(line[len(tracing.TRACE_MARKER):])['function'] == 'clients'
+
+
+def test_all_functions_ship_the_same_tracing_module():
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    copies = {}
+    for path in glob.glob(os.path.join(backend_dir, '*', 'tracing.py')):
+        with open(path, 'rb') as f:
+            copies[path] = f.read()
+    assert len(copies) == 8
+    assert len(set(copies.values())) == 1
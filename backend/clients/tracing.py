@@ -0,0 +1,138 @@
+import functools
+import hashlib
+import hmac
+import json
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, Optional
+
+TRACE_MAX_BODY = 64 * 1024
+TRACE_HEADERS = ('range', 'content-type')
+# Префикс строки трассы в логах функции: по нему записи отделяются от прочего вывода
+TRACE_MARKER = 'TRACE '
+
+# Реквизиты и контакты заменяются значениями, допустимыми для своих колонок
+REDACTED_FIELDS = {
+    'passport_series_number': None,
+    'inn': None,
+    'ogrn': None,
+    'date_of_birth': None,
+    'contact_info': {}
+}
+# Имена и свободный текст заменяются непустыми псевдонимами: одинаковые значения дают одинаковый
+# псевдоним, поэтому проверки обязательных полей и дублей при воспроизведении ведут себя как в исходных запросах
+MASKED_FIELDS = (
+    'full_name', 'company_name', 'address', 'legal_address',
+    'title', 'description', 'result_comment', 'purpose', 'filename'
+)
+# Содержимое файлов заменяется нулями того же размера
+BINARY_FIELDS = ('data',)
+
+# Ключ псевдонимов; без TRACE_MASK_KEY - случайный на процесс, чтобы псевдоним нельзя было подобрать по словарю
+_MASK_KEY = os.environ.get('TRACE_MASK_KEY', '').encode('utf-8') or os.urandom(16)
+
+
+def capture_trace(function_name: str) -> Callable:
+    '''
+    Опциональная запись трассы запросов для нагрузочного воспроизведения.
+    TRACE_CAPTURE=1 - по строке JSON на запрос в stdout с префиксом TRACE_MARKER (попадает в логи функции
+    на платформе), TRACE_CAPTURE_PATH - в локальный JSONL-файл. Без них обработчик не оборачивается.
+    Персональные данные и содержимое файлов маскируются, см. REDACTED_FIELDS и MASKED_FIELDS
+    '''
+    def decorator(handler: Callable) -> Callable:
+        path = os.environ.get('TRACE_CAPTURE_PATH')
+        if not path and not os.environ.get('TRACE_CAPTURE'):
+            return handler
+
+        @functools.wraps(handler)
+        def wrapper(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+            started_at = time.time()
+            started = time.perf_counter()
+            status = None
+            try:
+                response = handler(event, context)
+                status = response.get('statusCode')
+                return response
+            finally:
+                _write_record(path, function_name, event, started_at, time.perf_counter() - started, status)
+
+        return wrapper
+
+    return decorator
+
+
+def _write_record(path: Optional[str], function_name: str, event: Dict[str, Any], started_at: float,
+                  duration: float, status: Any) -> None:
+    body = _redact(event.get('body'), bool(event.get('isBase64Encoded')))
+    record = {
+        'function': function_name,
+        'ts': started_at,
+        'method': event.get('httpMethod', 'GET'),
+        'path': event.get('path', '/'),
+        'query': event.get('queryStringParameters') or {},
+        'headers': {
+            key: value for key, value in (event.get('headers') or {}).items()
+            if key.lower() in TRACE_HEADERS
+        },
+        'body': body if body is None or len(body) <= TRACE_MAX_BODY else None,
+        'body_omitted': body is not None and len(body) > TRACE_MAX_BODY,
+        'isBase64Encoded': bool(event.get('isBase64Encoded')),
+        'duration_ms': round(duration * 1000, 3),
+        'status': status
+    }
+    line = json.dumps(record, ensure_ascii=False, default=str) + '\n'
+
+    # Запись целиком одним os.write, чтобы строки параллельных процессов не перемешивались
+    try:
+        if path:
+            fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line.encode('utf-8'))
+            finally:
+                os.close(fd)
+        else:
+            sys.stdout.flush()
+            os.write(1, (TRACE_MARKER + line).encode('utf-8'))
+    except (OSError, ValueError):
+        pass
+
+
+def _redact(body: Any, is_base64: bool) -> Any:
+    if not body:
+        return body
+    if is_base64:
+        return _mask_base64(body)
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return body
+    return json.dumps(_redact_value(data), ensure_ascii=False)
+
+
+def _redact_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {key: _redact_field(key, item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_redact_value(item) for item in value]
+    return value
+
+
+def _redact_field(key: str, value: Any) -> Any:
+    if key in REDACTED_FIELDS:
+        return REDACTED_FIELDS[key]
+    if key in MASKED_FIELDS and isinstance(value, str) and value:
+        return _mask_text(value)
+    if key in BINARY_FIELDS and isinstance(value, str):
+        return _mask_base64(value)
+    return _redact_value(value)
+
+
+def _mask_text(value: str) -> str:
+    return hmac.new(_MASK_KEY, value.encode('utf-8'), hashlib.sha256).hexdigest()[:16]
+
+
+def _mask_base64(value: str) -> str:
+    # Нули в base64 - символы 'A'; дополнение '=' сохраняется, чтобы не изменился размер данных
+    stripped = value.rstrip('=')
+    return 'A' * len(stripped) + '=' * (len(value) - len(stripped))
@@ -0,0 +1,48 @@
+'''
+Сравнение задержки сводки дашборда в трех режимах:
+  sync       - последовательно через psycopg2, новое соединение на каждый вызов (как в остальных функциях)
+  sequential - последовательно на одном соединении из пула asyncpg
+  async      - параллельно на соединениях из пула asyncpg
+Выигрыш от переиспользования соединений (sync / sequential) и от параллельности (sequential / async)
+выводится отдельно
+
+Запуск: DATABASE_URL=postgresql://... python benchmark.py [количество_итераций]
+'''
+import statistics
+import sys
+import time
+
+from index import handler
+
+
+def measure(mode: str, iterations: int) -> list:
+    event = {'httpMethod': 'GET', 'queryStringParameters': {'mode': mode}}
+    handler(event, None)
+    
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        response = handler(event, None)
+        timings.append((time.perf_counter() - started) * 1000)
+        assert response['statusCode'] == 200, response
+    return timings
+
+
+def main() -> None:
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    
+    print(f'{"mode":<12}{"mean, ms":>12}{"p50, ms":>12}{"p95, ms":>12}')
+    results = {}
+    for mode in ('sync', 'sequential', 'async'):
+        timings = sorted(measure(mode, iterations))
+        results[mode] = statistics.median(timings)
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        print(f'{mode:<12}{statistics.mean(timings):>12.2f}{results[mode]:>12.2f}{p95:>12.2f}')
+    
+    print(f'connection reuse (p50, sync / sequential): {results["sync"] / results["sequential"]:.2f}x')
+    print(f'concurrency (p50, sequential / async): {results["sequential"] / results["async"]:.2f}x')
+    print(f'total (p50, sync / async): {results["sync"] / results["async"]:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+import asyncio
+import json
+import os
+import time
+import asyncpg
+import psycopg2
+from psycopg2.extras import RealDictCursor
+from typing import Dict, Any, List, Optional, Callable, Awaitable
+from tracing import capture_trace
+
+QUERIES = {
+    'cases': '''
+        SELECT 
+            c.*,
+            cl.full_name as client_name,
+            cl.company_name as client_company,
+            u.full_name as responsible_name,
+            (SELECT COUNT(*) FROM tasks WHERE case_id = c.id) as tasks_count,
+            (SELECT COUNT(*) FROM tasks WHERE case_id = c.id AND status = 'выполнена') as completed_tasks
+        FROM cases c
+        LEFT JOIN clients cl ON c.client_id = cl.id
+        LEFT JOIN users u ON c.responsible_user_id = u.id
+        ORDER BY c.created_at DESC
+    ''',
+    'clients': '''
+        SELECT 
+            c.*,
+            (SELECT COUNT(*) FROM cases WHERE client_id = c.id) as cases_count
+        FROM clients c
+        ORDER BY c.created_at DESC
+    ''',
+    'task_counts': '''
+        SELECT 
+            status,
+            COUNT(*) as count,
+            COUNT(*) FILTER (WHERE status <> 'выполнена' AND due_date < CURRENT_TIMESTAMP) as overdue
+        FROM tasks
+        GROUP BY status
+    ''',
+    'finances': '''
+        SELECT 'payments' as kind, status, COALESCE(SUM(amount), 0) as total, COUNT(*) as count
+        FROM payments
+        GROUP BY status
+        UNION ALL
+        SELECT 'expenses' as kind, status, COALESCE(SUM(amount), 0) as total, COUNT(*) as count
+        FROM expenses
+        GROUP BY status
+    '''
+}
+
+POOL_MIN_SIZE = 1
+POOL_MAX_SIZE = len(QUERIES)
+
+# Цикл событий и пул живут между вызовами "теплого" экземпляра функции
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_pool: Optional[asyncpg.Pool] = None
+
+
+@capture_trace('dashboard')
+def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    '''
+    API сводки для дашборда: дела, клиенты, счетчики задач и финансовые итоги одним ответом.
+    По умолчанию независимые запросы выполняются параллельно через пул asyncpg.
+    Для сравнения: ?mode=sequential - те же запросы по очереди на одном соединении из пула,
+    ?mode=sync - по очереди через psycopg2 с новым соединением на каждый вызов
+    '''
+    method: str = event.get('httpMethod', 'GET')
+    
+    if method == 'OPTIONS':
+        return {
+            'statusCode': 200,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',
+                'Access-Control-Allow-Methods': 'GET, OPTIONS',
+                'Access-Control-Allow-Headers': 'Content-Type',
+                'Access-Control-Max-Age': '86400'
+            },
+            'body': '',
+            'isBase64Encoded': False
+        }
+    
+    if method != 'GET':
+        return {
+            'statusCode': 405,
+            'headers': {'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': 'Method not allowed'}),
+            'isBase64Encoded': False
+        }
+    
+    params = event.get('queryStringParameters') or {}
+    started = time.perf_counter()
+    
+    mode = params.get('mode')
+    
+    if mode == 'sync':
+        result = fetch_sync()
+    elif mode == 'sequential':
+        result = _get_loop().run_until_complete(_with_pool(fetch_sequential))
+    else:
+        result = _get_loop().run_until_complete(_with_pool(fetch_async))
+    
+    result['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 2)
+    
+    return {
+        'statusCode': 200,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*'
+        },
+        'body': json.dumps(result, default=str),
+        'isBase64Encoded': False
+    }
+
+
+async def fetch_async(pool: asyncpg.Pool) -> Dict[str, Any]:
+    '''
+    Выполняет все запросы сводки одновременно, каждый на своем соединении из пула
+    '''
+    async def run(name: str) -> List[Dict[str, Any]]:
+        async with pool.acquire() as conn:
+            return [dict(row) for row in await conn.fetch(QUERIES[name])]
+    
+    names = list(QUERIES)
+    # Дожидаемся всех запросов, чтобы при повторе с новым пулом не осталось висящих задач
+    results = await asyncio.gather(*(run(name) for name in names), return_exceptions=True)
+    for item in results:
+        if isinstance(item, BaseException):
+            raise item
+    return dict(zip(names, results))
+
+
+async def fetch_sequential(pool: asyncpg.Pool) -> Dict[str, Any]:
+    '''
+    Выполняет те же запросы по очереди на одном соединении из пула: без затрат на подключение,
+    но и без параллельности
+    '''
+    async with pool.acquire() as conn:
+        return {name: [dict(row) for row in await conn.fetch(query)] for name, query in QUERIES.items()}
+
+
+def fetch_sync() -> Dict[str, Any]:
+    '''
+    Выполняет те же запросы последовательно на одном соединении psycopg2
+    '''
+    conn = psycopg2.connect(os.environ['DATABASE_URL'])
+    
+    try:
+        result = {}
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            for name, query in QUERIES.items():
+                cur.execute(query)
+                result[name] = [dict(row) for row in cur.fetchall()]
+        return result
+    
+    finally:
+        conn.close()
+
+
+async def _with_pool(fetch: Callable[[asyncpg.Pool], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+    '''
+    Выполняет fetch на пуле; если соединение из пула оказалось разорвано (перезапуск базы,
+    таймаут простоя), пересоздает пул и повторяет один раз
+    '''
+    global _pool
+    try:
+        return await fetch(await _get_pool())
+    except (asyncpg.ConnectionDoesNotExistError, asyncpg.InterfaceError):
+        if _pool is not None:
+            _pool.terminate()
+            _pool = None
+        return await fetch(await _get_pool())
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    global _loop, _pool
+    if _loop is None or _loop.is_closed():
+        _loop = asyncio.new_event_loop()
+        # Пул привязан к циклу, в котором создан
+        _pool = None
+    return _loop
+
+
+async def _get_pool() -> asyncpg.Pool:
+    global _pool
+    if _pool is None:
+        _pool = await asyncpg.create_pool(
+            os.environ['DATABASE_URL'],
+            min_size=POOL_MIN_SIZE,
+            max_size=POOL_MAX_SIZE,
+            init=_init_connection
+        )
+    return _pool
+
+
+async def _init_connection(conn: asyncpg.Connection) -> None:
+    for type_name in ('json', 'jsonb'):
+        await conn.set_type_codec(type_name, encoder=json.dumps, decoder=json.loads, schema='pg_catalog')
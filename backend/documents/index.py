@@ -0,0 +1,605 @@
+import base64
+import hashlib
+import json
+import os
+import re
+import uuid
+from urllib.parse import quote
+import psycopg2
+from psycopg2.extras import RealDictCursor
+from typing import Dict, Any, List, Optional, Tuple
+
+from storage import Storage, get_storage
+from tracing import capture_trace
+
+# Тело запроса и ответа функции ограничено 3.5 МБ, а чанк передается в base64 (+33%):
+# 2 МиБ дают ~2.7 МБ тела и оставляют запас на JSON-обертку
+CHUNK_SIZE = 2 * 1024 * 1024
+MAX_RANGE_BYTES = CHUNK_SIZE
+# Ограничивает число чанков (и размер списка missing_chunks в ответе) одной загрузки
+MAX_DOCUMENT_SIZE = 1024 * 1024 * 1024
+
+CORS_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Expose-Headers': 'Content-Range, Accept-Ranges, Content-Length, ETag, Content-Disposition'
+}
+
+# Клиент хранилища (boto3) переиспользуется между вызовами "теплого" экземпляра функции
+_storage: Optional[Storage] = None
+
+
+@capture_trace('documents')
+def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    '''
+    API для работы с документами: список, метаданные, возобновляемая загрузка чанками,
+    скачивание по диапазонам. Чанки хранятся по SHA-256, содержимое файла адресуется хешем манифеста
+    (SHA-256 от последовательности SHA-256 чанков) и не дублируется между делами и версиями
+    '''
+    method: str = event.get('httpMethod', 'GET')
+
+    if method == 'OPTIONS':
+        return {
+            'statusCode': 200,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',
+                'Access-Control-Allow-Methods': 'GET, POST, PUT, OPTIONS',
+                'Access-Control-Allow-Headers': 'Content-Type, Range',
+                'Access-Control-Max-Age': '86400'
+            },
+            'body': '',
+            'isBase64Encoded': False
+        }
+
+    params = event.get('queryStringParameters') or {}
+    action = params.get('action')
+
+    conn = psycopg2.connect(os.environ['DATABASE_URL'])
+
+    try:
+        if method == 'GET':
+            if action == 'download':
+                return download_document(conn, _get_storage(), params.get('id'), _get_header(event, 'Range'))
+            if action == 'status':
+                return upload_status(conn, params.get('upload_id'))
+            if params.get('id'):
+                return get_document(conn, params['id'])
+            return list_documents(conn, params)
+
+        elif method == 'POST':
+            body = json.loads(event.get('body') or '{}')
+            if action == 'complete':
+                return complete_upload(conn, body.get('upload_id'))
+            return init_upload(conn, body)
+
+        elif method == 'PUT':
+            if event.get('isBase64Encoded'):
+                upload_id = params.get('upload_id')
+                index = params.get('index')
+                data = base64.b64decode(event.get('body') or '')
+            else:
+                body = json.loads(event.get('body') or '{}')
+                upload_id = body.get('upload_id')
+                index = body.get('index')
+                data = base64.b64decode(body.get('data') or '')
+            return upload_chunk(conn, _get_storage(), upload_id, index, data)
+
+        return {
+            'statusCode': 405,
+            'headers': {'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': 'Method not allowed'}),
+            'isBase64Encoded': False
+        }
+
+    finally:
+        conn.close()
+
+
+def list_documents(conn, params: Dict[str, Any]) -> Dict[str, Any]:
+    '''
+    Список последних версий документов с фильтрацией по делу и задаче
+    '''
+    conditions = ['NOT EXISTS (SELECT 1 FROM documents n WHERE n.previous_version_id = d.id)']
+    values: List[Any] = []
+    if params.get('case_id'):
+        conditions.append('d.case_id = %s')
+        values.append(params['case_id'])
+    if params.get('task_id'):
+        conditions.append('d.task_id = %s')
+        values.append(params['task_id'])
+
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(f'''
+            SELECT
+                d.*,
+                u.full_name as uploaded_by_name
+            FROM documents d
+            LEFT JOIN users u ON d.uploaded_by = u.id
+            WHERE {' AND '.join(conditions)}
+            ORDER BY d.uploaded_at DESC
+        ''', values)
+        documents = cur.fetchall()
+
+    return _json_response(200, [dict(row) for row in documents])
+
+
+def get_document(conn, document_id: str) -> Dict[str, Any]:
+    '''
+    Метаданные документа и история его версий
+    '''
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute('SELECT * FROM documents WHERE id = %s', (document_id,))
+        document = cur.fetchone()
+        if not document:
+            return _error(404, 'Документ не найден')
+
+        cur.execute('''
+            WITH RECURSIVE chain AS (
+                SELECT * FROM documents WHERE id = %s
+                UNION ALL
+                SELECT d.* FROM documents d JOIN chain ch ON d.id = ch.previous_version_id
+            )
+            SELECT id, version, size, content_sha256, uploaded_by, uploaded_at
+            FROM chain
+            ORDER BY version DESC
+        ''', (document_id,))
+        versions = cur.fetchall()
+
+    result = dict(document)
+    result['versions'] = [dict(row) for row in versions]
+    return _json_response(200, result)
+
+
+def init_upload(conn, body: Dict[str, Any]) -> Dict[str, Any]:
+    '''
+    Начинает загрузку. sha256 - хеш манифеста (см. _manifest_sha256), клиент считает его по чанкам
+    размера CHUNK_SIZE. Если такое содержимое уже хранится, документ создается сразу.
+    Чанки из chunk_sha256, которые уже есть в хранилище, считаются полученными
+    '''
+    size = body.get('size')
+    if not body.get('filename') or not isinstance(size, int) or size < 0:
+        return _error(400, 'Требуются filename и size')
+    if size > MAX_DOCUMENT_SIZE:
+        return _error(400, f'Размер документа превышает {MAX_DOCUMENT_SIZE} байт')
+
+    sha256 = _normalize_sha(body.get('sha256'))
+    chunks_count = _chunks_count(size, CHUNK_SIZE)
+
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        meta = dict(body)
+        if body.get('previous_document_id'):
+            cur.execute('SELECT * FROM documents WHERE id = %s', (body['previous_document_id'],))
+            previous = cur.fetchone()
+            if not previous:
+                return _error(404, 'Предыдущая версия документа не найдена')
+            for field in ('original_name', 'mime_type', 'description', 'category', 'case_id', 'task_id'):
+                if meta.get(field) is None:
+                    meta[field] = previous[field]
+
+        if sha256:
+            cur.execute('SELECT size FROM document_contents WHERE sha256 = %s', (sha256,))
+            content = cur.fetchone()
+            if content and content['size'] == size:
+                document = _create_document(cur, meta, sha256, size)
+                conn.commit()
+                return _json_response(201, {
+                    'id': document['id'],
+                    'version': document['version'],
+                    'sha256': sha256,
+                    'deduplicated': True,
+                    'message': 'Документ загружен'
+                })
+
+        upload_id = str(uuid.uuid4())
+        cur.execute('''
+            INSERT INTO document_uploads
+            (id, filename, original_name, mime_type, size, chunk_size, sha256, description,
+             category, case_id, task_id, uploaded_by, previous_document_id)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        ''', (
+            upload_id,
+            meta.get('filename'),
+            meta.get('original_name'),
+            meta.get('mime_type'),
+            size,
+            CHUNK_SIZE,
+            sha256,
+            meta.get('description'),
+            meta.get('category'),
+            meta.get('case_id'),
+            meta.get('task_id'),
+            meta.get('uploaded_by'),
+            meta.get('previous_document_id')
+        ))
+
+        chunk_hashes = [_normalize_sha(h) for h in (body.get('chunk_sha256') or [])]
+        if chunk_hashes and len(chunk_hashes) == chunks_count:
+            cur.execute('''
+                INSERT INTO document_upload_parts (upload_id, chunk_index, chunk_sha256)
+                SELECT %s, h.idx - 1, h.sha
+                FROM unnest(%s::text[]) WITH ORDINALITY AS h(sha, idx)
+                JOIN document_chunks dc ON dc.sha256 = h.sha
+                WHERE dc.size = CASE WHEN h.idx = %s THEN %s ELSE %s END
+            ''', (
+                upload_id,
+                chunk_hashes,
+                chunks_count,
+                size - (chunks_count - 1) * CHUNK_SIZE,
+                CHUNK_SIZE
+            ))
+
+        missing = _missing_chunks(cur, upload_id, chunks_count)
+        conn.commit()
+
+    return _json_response(201, {
+        'upload_id': upload_id,
+        'chunk_size': CHUNK_SIZE,
+        'chunks_count': chunks_count,
+        'missing_chunks': missing,
+        'message': 'Загрузка начата'
+    })
+
+
+def upload_chunk(conn, storage: Storage, upload_id: Optional[str], index: Any, data: bytes) -> Dict[str, Any]:
+    '''
+    Принимает один чанк. Повторная отправка того же чанка безопасна
+    '''
+    try:
+        index = int(index)
+    except (TypeError, ValueError):
+        return _error(400, 'Требуется номер чанка index')
+
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        upload = _get_upload(cur, upload_id)
+        if not upload:
+            return _error(404, 'Загрузка не найдена')
+        if upload['status'] != 'в процессе':
+            return _error(409, 'Загрузка уже завершена')
+
+        chunks_count = _chunks_count(upload['size'], upload['chunk_size'])
+        if index < 0 or index >= chunks_count:
+            return _error(400, 'Неверный номер чанка')
+        expected_size = min(upload['chunk_size'], upload['size'] - index * upload['chunk_size'])
+        if len(data) != expected_size:
+            return _error(400, f'Ожидался чанк размером {expected_size} байт')
+
+        chunk_sha = hashlib.sha256(data).hexdigest()
+        cur.execute('SELECT 1 FROM document_chunks WHERE sha256 = %s', (chunk_sha,))
+        if not cur.fetchone():
+            key = _chunk_key(chunk_sha)
+            storage.put(key, data)
+            cur.execute('''
+                INSERT INTO document_chunks (sha256, size, storage_path)
+                VALUES (%s, %s, %s)
+                ON CONFLICT (sha256) DO NOTHING
+            ''', (chunk_sha, len(data), key))
+
+        cur.execute('''
+            INSERT INTO document_upload_parts (upload_id, chunk_index, chunk_sha256)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (upload_id, chunk_index)
+            DO UPDATE SET chunk_sha256 = EXCLUDED.chunk_sha256, received_at = CURRENT_TIMESTAMP
+        ''', (upload_id, index, chunk_sha))
+
+        missing = _missing_chunks(cur, upload_id, chunks_count)
+        conn.commit()
+
+    return _json_response(200, {
+        'index': index,
+        'sha256': chunk_sha,
+        'missing_count': len(missing),
+        'message': 'Чанк получен'
+    })
+
+
+def upload_status(conn, upload_id: Optional[str]) -> Dict[str, Any]:
+    '''
+    Состояние загрузки: какие чанки еще нужно отправить для возобновления
+    '''
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        upload = _get_upload(cur, upload_id)
+        if not upload:
+            return _error(404, 'Загрузка не найдена')
+        chunks_count = _chunks_count(upload['size'], upload['chunk_size'])
+        missing = _missing_chunks(cur, upload_id, chunks_count)
+
+    return _json_response(200, {
+        'upload_id': upload_id,
+        'status': upload['status'],
+        'document_id': upload['document_id'],
+        'size': upload['size'],
+        'chunk_size': upload['chunk_size'],
+        'chunks_count': chunks_count,
+        'missing_chunks': missing
+    })
+
+
+def complete_upload(conn, upload_id: Optional[str]) -> Dict[str, Any]:
+    '''
+    Завершает загрузку: проверяет хеш манифеста и создает документ (или новую версию).
+    SHA-256 каждого чанка уже проверен при приеме, поэтому содержимое из хранилища не перечитывается
+    '''
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute('SELECT * FROM document_uploads WHERE id = %s FOR UPDATE', (upload_id,))
+        upload = cur.fetchone()
+        if not upload:
+            return _error(404, 'Загрузка не найдена')
+        if upload['status'] == 'завершена':
+            return _json_response(200, {'id': upload['document_id'], 'message': 'Документ загружен'})
+
+        chunks_count = _chunks_count(upload['size'], upload['chunk_size'])
+        if _missing_chunks(cur, upload_id, chunks_count):
+            return _error(409, 'Получены не все чанки')
+
+        cur.execute('''
+            SELECT chunk_sha256
+            FROM document_upload_parts
+            WHERE upload_id = %s
+            ORDER BY chunk_index
+        ''', (upload_id,))
+        parts = cur.fetchall()
+        sha256 = _manifest_sha256([part['chunk_sha256'] for part in parts])
+
+        if upload['sha256'] and upload['sha256'] != sha256:
+            return _error(422, 'Хеш файла не совпадает с заявленным')
+
+        cur.execute('''
+            INSERT INTO document_contents (sha256, size, chunk_size, chunks_count)
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT (sha256) DO NOTHING
+            RETURNING sha256
+        ''', (sha256, upload['size'], upload['chunk_size'], chunks_count))
+        deduplicated = cur.fetchone() is None
+        if not deduplicated and parts:
+            cur.execute('''
+                INSERT INTO document_content_chunks (content_sha256, chunk_index, chunk_sha256)
+                SELECT %s, chunk_index, chunk_sha256
+                FROM document_upload_parts
+                WHERE upload_id = %s
+            ''', (sha256, upload_id))
+
+        document = _create_document(cur, upload, sha256, upload['size'])
+        cur.execute('''
+            UPDATE document_uploads
+            SET status = 'завершена', document_id = %s, completed_at = CURRENT_TIMESTAMP
+            WHERE id = %s
+        ''', (document['id'], upload_id))
+        conn.commit()
+
+    return _json_response(201, {
+        'id': document['id'],
+        'version': document['version'],
+        'sha256': sha256,
+        'deduplicated': deduplicated,
+        'message': 'Документ загружен'
+    })
+
+
+def download_document(conn, storage: Storage, document_id: Optional[str], range_header: Optional[str]) -> Dict[str, Any]:
+    '''
+    Отдает документ целиком (200), если он не больше MAX_RANGE_BYTES, иначе требует заголовок Range.
+    На запрос диапазона отвечает 206, отдавая не более MAX_RANGE_BYTES за раз
+    '''
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute('''
+            SELECT d.filename, d.mime_type, d.content_sha256, dc.size, dc.chunk_size
+            FROM documents d
+            JOIN document_contents dc ON dc.sha256 = d.content_sha256
+            WHERE d.id = %s
+        ''', (document_id,))
+        document = cur.fetchone()
+        if not document:
+            return _error(404, 'Документ не найден')
+
+        size = document['size']
+        if range_header is None:
+            if size > MAX_RANGE_BYTES:
+                return {
+                    'statusCode': 400,
+                    'headers': {
+                        'Content-Type': 'application/json',
+                        'Access-Control-Allow-Origin': '*',
+                        'Accept-Ranges': 'bytes'
+                    },
+                    'body': json.dumps({
+                        'error': f'Файл больше {MAX_RANGE_BYTES} байт, скачивайте его частями с заголовком Range',
+                        'size': size,
+                        'max_range_bytes': MAX_RANGE_BYTES
+                    }),
+                    'isBase64Encoded': False
+                }
+            start, end = 0, size
+        else:
+            try:
+                byte_range = _parse_range(range_header, size)
+            except ValueError as e:
+                return _error(400, str(e))
+            if byte_range is None:
+                return {
+                    'statusCode': 416,
+                    'headers': {**CORS_HEADERS, 'Content-Range': f'bytes */{size}'},
+                    'body': '',
+                    'isBase64Encoded': False
+                }
+            start, end = byte_range
+            end = min(end, start + MAX_RANGE_BYTES)
+
+        chunk_size = document['chunk_size']
+        data = b''
+        if end > start:
+            cur.execute('''
+                SELECT cc.chunk_index, ch.storage_path
+                FROM document_content_chunks cc
+                JOIN document_chunks ch ON ch.sha256 = cc.chunk_sha256
+                WHERE cc.content_sha256 = %s AND cc.chunk_index BETWEEN %s AND %s
+                ORDER BY cc.chunk_index
+            ''', (document['content_sha256'], start // chunk_size, (end - 1) // chunk_size))
+            chunks = [(chunk['chunk_index'], chunk['storage_path']) for chunk in cur.fetchall()]
+            data = _read_range(storage, chunks, chunk_size, start, end)
+
+    headers = {
+        **CORS_HEADERS,
+        'Content-Type': document['mime_type'] or 'application/octet-stream',
+        'Content-Disposition': _content_disposition(document['filename']),
+        'Content-Length': str(len(data)),
+        'Accept-Ranges': 'bytes',
+        'ETag': f'"{document["content_sha256"]}"'
+    }
+    if range_header is not None:
+        headers['Content-Range'] = f'bytes {start}-{end - 1}/{size}'
+
+    return {
+        'statusCode': 206 if range_header is not None else 200,
+        'headers': headers,
+        'body': base64.b64encode(data).decode('ascii'),
+        'isBase64Encoded': True
+    }
+
+
+def _create_document(cur, meta: Dict[str, Any], sha256: str, size: int) -> Dict[str, Any]:
+    previous_id = meta.get('previous_document_id')
+    cur.execute('''
+        INSERT INTO documents
+        (filename, storage_path, original_name, mime_type, size, description, case_id, task_id,
+         uploaded_by, version, category, content_sha256, previous_version_id)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s,
+                COALESCE((SELECT version + 1 FROM documents WHERE id = %s), 1),
+                %s, %s, %s)
+        RETURNING id, version
+    ''', (
+        meta.get('filename'),
+        f'contents/{sha256}',
+        meta.get('original_name'),
+        meta.get('mime_type'),
+        size,
+        meta.get('description'),
+        meta.get('case_id'),
+        meta.get('task_id'),
+        meta.get('uploaded_by'),
+        previous_id,
+        meta.get('category'),
+        sha256,
+        previous_id
+    ))
+    return cur.fetchone()
+
+
+def _get_storage() -> Storage:
+    global _storage
+    if _storage is None:
+        _storage = get_storage()
+    return _storage
+
+
+def _content_disposition(filename: str) -> str:
+    '''
+    Заголовок Content-Disposition по RFC 6266: ASCII-замена в filename и точное имя в filename*
+    '''
+    fallback = re.sub(r'[^\x20-\x7e]|["\\]', '_', filename)
+    return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename, safe='')}"
+
+
+def _get_upload(cur, upload_id: Optional[str]) -> Optional[Dict[str, Any]]:
+    if not upload_id:
+        return None
+    cur.execute('SELECT * FROM document_uploads WHERE id = %s', (upload_id,))
+    return cur.fetchone()
+
+
+def _missing_chunks(cur, upload_id: str, chunks_count: int) -> List[int]:
+    cur.execute('''
+        SELECT i AS chunk_index
+        FROM generate_series(0, %s - 1) AS i
+        WHERE NOT EXISTS (
+            SELECT 1 FROM document_upload_parts p
+            WHERE p.upload_id = %s AND p.chunk_index = i
+        )
+        ORDER BY i
+    ''', (chunks_count, upload_id))
+    return [row['chunk_index'] for row in cur.fetchall()]
+
+
+def _chunks_count(size: int, chunk_size: int) -> int:
+    return (size + chunk_size - 1) // chunk_size
+
+
+def _chunk_key(sha256: str) -> str:
+    return f'chunks/{sha256[:2]}/{sha256}'
+
+
+def _normalize_sha(value: Any) -> Optional[str]:
+    if not isinstance(value, str):
+        return None
+    value = value.strip().lower()
+    return value if re.fullmatch(r'[0-9a-f]{64}', value) else None
+
+
+def _manifest_sha256(chunk_hashes: List[str]) -> str:
+    '''
+    Хеш содержимого: SHA-256 от последовательности двоичных SHA-256 чанков по порядку
+    '''
+    digest = hashlib.sha256()
+    for chunk_hash in chunk_hashes:
+        digest.update(bytes.fromhex(chunk_hash))
+    return digest.hexdigest()
+
+
+def _read_range(storage: Storage, chunks: List[Tuple[int, str]], chunk_size: int, start: int, end: int) -> bytes:
+    '''
+    Собирает байты [start, end) из чанков (номер, путь в хранилище), читая из каждого только нужную часть
+    '''
+    pieces = []
+    for chunk_index, storage_path in chunks:
+        chunk_start = chunk_index * chunk_size
+        pieces.append(storage.get(
+            storage_path,
+            max(start - chunk_start, 0),
+            min(end - chunk_start, chunk_size)
+        ))
+    return b''.join(pieces)
+
+
+def _parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    '''
+    Разбирает заголовок Range вида bytes=a-b, bytes=a- или bytes=-n в полуинтервал [start, end).
+    None - диапазон вне файла (416), ValueError - некорректный или составной заголовок (400)
+    '''
+    if ',' in header:
+        raise ValueError('Поддерживается только один диапазон в заголовке Range')
+    match = re.fullmatch(r'\s*bytes=(\d*)-(\d*)\s*', header)
+    if not match or (not match.group(1) and not match.group(2)):
+        raise ValueError('Некорректный заголовок Range')
+    if not match.group(1):
+        suffix = int(match.group(2))
+        if suffix == 0:
+            return None
+        return max(size - suffix, 0), size
+    start = int(match.group(1))
+    if match.group(2) and int(match.group(2)) < start:
+        raise ValueError('Некорректный заголовок Range')
+    end = int(match.group(2)) + 1 if match.group(2) else size
+    if start >= size:
+        return None
+    return start, min(end, size)
+
+
+def _get_header(event: Dict[str, Any], name: str) -> Optional[str]:
+    for key, value in (event.get('headers') or {}).items():
+        if key.lower() == name.lower():
+            return value
+    return None
+
+
+def _json_response(status: int, payload: Any) -> Dict[str, Any]:
+    return {
+        'statusCode': status,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*'
+        },
+        'body': json.dumps(payload, default=str),
+        'isBase64Encoded': False
+    }
+
+
+def _error(status: int, message: str) -> Dict[str, Any]:
+    return _json_response(status, {'error': message})
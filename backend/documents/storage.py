@@ -0,0 +1,92 @@
+import os
+from abc import ABC, abstractmethod
+from typing import Optional
+
+
+class Storage(ABC):
+    '''
+    Интерфейс хранилища бинарных объектов, адресуемых по ключу
+    '''
+
+    @abstractmethod
+    def put(self, key: str, data: bytes) -> None:
+        ...
+
+    @abstractmethod
+    def get(self, key: str, start: int = 0, end: Optional[int] = None) -> bytes:
+        '''
+        Возвращает байты [start, end) объекта; end=None - до конца объекта
+        '''
+
+
+class LocalStorage(Storage):
+    '''
+    Хранилище на локальной файловой системе (для тестов и локального запуска)
+    '''
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, key: str) -> str:
+        path = os.path.normpath(os.path.join(self.root, key))
+        if not path.startswith(os.path.normpath(self.root) + os.sep):
+            raise ValueError(f'Invalid storage key: {key}')
+        return path
+
+    def put(self, key: str, data: bytes) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def get(self, key: str, start: int = 0, end: Optional[int] = None) -> bytes:
+        with open(self._path(key), 'rb') as f:
+            f.seek(start)
+            if end is None:
+                return f.read()
+            return f.read(max(end - start, 0))
+
+
+class S3Storage(Storage):
+    '''
+    Хранилище в S3-совместимом бакете
+    '''
+
+    def __init__(self, bucket: str, client):
+        self.bucket = bucket
+        self.client = client
+
+    def put(self, key: str, data: bytes) -> None:
+        self.client.put_object(Bucket=self.bucket, Key=key, Body=data)
+
+    def get(self, key: str, start: int = 0, end: Optional[int] = None) -> bytes:
+        if start == 0 and end is None:
+            response = self.client.get_object(Bucket=self.bucket, Key=key)
+        else:
+            byte_range = f'bytes={start}-' if end is None else f'bytes={start}-{end - 1}'
+            response = self.client.get_object(Bucket=self.bucket, Key=key, Range=byte_range)
+        return response['Body'].read()
+
+
+def get_storage() -> Storage:
+    '''
+    Выбирает реализацию хранилища по переменной окружения STORAGE_BACKEND
+    '''
+    backend = os.environ.get('STORAGE_BACKEND', 's3')
+
+    if backend == 'local':
+        return LocalStorage(os.environ.get('STORAGE_DIR', '/tmp/documents'))
+
+    if backend == 's3':
+        import boto3
+        client = boto3.client(
+            's3',
+            endpoint_url=os.environ.get('S3_ENDPOINT_URL'),
+            aws_access_key_id=os.environ.get('AWS_ACCESS_KEY_ID'),
+            aws_secret_access_key=os.environ.get('AWS_SECRET_ACCESS_KEY')
+        )
+        return S3Storage(os.environ['S3_BUCKET'], client)
+
+    raise ValueError(f'Unknown storage backend: {backend}')
@@ -0,0 +1,161 @@
+import base64
+import hashlib
+import json
+import os
+
+import pytest
+
+import index
+from storage import LocalStorage
+
+
+def _chunks(data: bytes):
+    return [data[i:i + index.CHUNK_SIZE] for i in range(0, len(data), index.CHUNK_SIZE)]
+
+
+def _manifest(data: bytes) -> str:
+    return index._manifest_sha256([hashlib.sha256(chunk).hexdigest() for chunk in _chunks(data)])
+
+
+def test_parse_range():
+    assert index._parse_range('bytes=0-99', 1000) == (0, 100)
+    assert index._parse_range('bytes=900-', 1000) == (900, 1000)
+    assert index._parse_range('bytes=-100', 1000) == (900, 1000)
+    assert index._parse_range('bytes=990-2000', 1000) == (990, 1000)
+    assert index._parse_range('bytes=1000-', 1000) is None
+    assert index._parse_range('bytes=-0', 1000) is None
+    for header in ('bytes=0-99,200-300', 'bytes=-', 'items=0-1', 'bytes=10-5'):
+        with pytest.raises(ValueError):
+            index._parse_range(header, 1000)
+
+
+def test_body_sizes_fit_platform_limit():
+    assert len(base64.b64encode(bytes(index.CHUNK_SIZE))) < 3.5 * 1024 * 1024
+    assert len(base64.b64encode(bytes(index.MAX_RANGE_BYTES))) < 3.5 * 1024 * 1024
+
+
+def test_content_disposition_is_ascii_with_utf8_filename():
+    header = index._content_disposition('Иск "Петров".pdf')
+    header.encode('latin-1')
+    assert header == (
+        "attachment; filename=\"___ ________.pdf\"; "
+        "filename*=UTF-8''%D0%98%D1%81%D0%BA%20%22%D0%9F%D0%B5%D1%82%D1%80%D0%BE%D0%B2%22.pdf"
+    )
+
+
+def test_manifest_sha256_of_empty_file_is_sha256_of_nothing():
+    assert index._manifest_sha256([]) == hashlib.sha256(b'').hexdigest()
+
+
+def test_chunks_in_local_storage_reassemble_ranges(tmp_path):
+    storage = LocalStorage(str(tmp_path))
+    data = os.urandom(index.CHUNK_SIZE * 2 + 12345)
+    chunks = []
+    for chunk_index, chunk in enumerate(_chunks(data)):
+        key = index._chunk_key(hashlib.sha256(chunk).hexdigest())
+        storage.put(key, chunk)
+        chunks.append((chunk_index, key))
+
+    for start, end in ((0, len(data)), (10, 20), (index.CHUNK_SIZE - 5, index.CHUNK_SIZE + 5), (len(data) - 1, len(data))):
+        first, last = start // index.CHUNK_SIZE, (end - 1) // index.CHUNK_SIZE
+        assert index._read_range(storage, chunks[first:last + 1], index.CHUNK_SIZE, start, end) == data[start:end]
+
+
+@pytest.fixture
+def call(tmp_path, monkeypatch):
+    '''
+    Вызов handler против тестовой базы с примененными миграциями (TEST_DATABASE_URL)
+    и локальным хранилищем во временном каталоге
+    '''
+    database_url = os.environ.get('TEST_DATABASE_URL')
+    if not database_url:
+        pytest.skip('TEST_DATABASE_URL не задан')
+    monkeypatch.setenv('DATABASE_URL', database_url)
+    monkeypatch.setenv('STORAGE_BACKEND', 'local')
+    monkeypatch.setenv('STORAGE_DIR', str(tmp_path))
+    monkeypatch.setattr(index, '_storage', None)
+
+    def _call(method, params=None, body=None, headers=None):
+        response = index.handler({
+            'httpMethod': method,
+            'queryStringParameters': params or {},
+            'headers': headers or {},
+            'body': json.dumps(body) if body is not None else None
+        }, None)
+        if response['isBase64Encoded']:
+            return response, base64.b64decode(response['body'])
+        return response, json.loads(response['body']) if response['body'] else None
+
+    return _call
+
+
+def _upload(call, data: bytes, sha256=None, skip=()):
+    response, started = call('POST', body={'filename': 'evidence.bin', 'size': len(data), 'sha256': sha256})
+    assert response['statusCode'] == 201
+    for chunk_index, chunk in enumerate(_chunks(data)):
+        if chunk_index in skip:
+            continue
+        response, _ = call('PUT', body={
+            'upload_id': started['upload_id'],
+            'index': chunk_index,
+            'data': base64.b64encode(chunk).decode('ascii')
+        })
+        assert response['statusCode'] == 200
+    return started['upload_id']
+
+
+def test_chunked_upload_resume_complete_and_download(call):
+    data = os.urandom(index.CHUNK_SIZE * 2 + 777)
+    upload_id = _upload(call, data, sha256=_manifest(data), skip={1})
+
+    response, status = call('GET', {'action': 'status', 'upload_id': upload_id})
+    assert status['missing_chunks'] == [1]
+    response, _ = call('POST', {'action': 'complete'}, {'upload_id': upload_id})
+    assert response['statusCode'] == 409
+
+    chunk = _chunks(data)[1]
+    call('PUT', body={'upload_id': upload_id, 'index': 1, 'data': base64.b64encode(chunk).decode('ascii')})
+    response, completed = call('POST', {'action': 'complete'}, {'upload_id': upload_id})
+    assert response['statusCode'] == 201
+    assert completed['sha256'] == _manifest(data)
+    document_id = completed['id']
+
+    response, _ = call('GET', {'action': 'download', 'id': document_id})
+    assert response['statusCode'] == 400
+
+    response, content = call('GET', {'action': 'download', 'id': document_id}, headers={'Range': 'bytes=100-'})
+    assert response['statusCode'] == 206
+    assert content == data[100:100 + index.MAX_RANGE_BYTES]
+    assert response['headers']['Content-Range'] == f'bytes 100-{100 + index.MAX_RANGE_BYTES - 1}/{len(data)}'
+
+    response, _ = call('GET', {'action': 'download', 'id': document_id}, headers={'Range': 'bytes=0-1,5-6'})
+    assert response['statusCode'] == 400
+    response, _ = call('GET', {'action': 'download', 'id': document_id}, headers={'Range': f'bytes={len(data)}-'})
+    assert response['statusCode'] == 416
+
+
+def test_init_rejects_oversized_document(call):
+    response, _ = call('POST', body={'filename': 'huge.bin', 'size': index.MAX_DOCUMENT_SIZE + 1})
+    assert response['statusCode'] == 400
+
+
+def test_complete_rejects_hash_mismatch(call):
+    data = os.urandom(1000)
+    upload_id = _upload(call, data, sha256='0' * 64)
+
+    response, _ = call('POST', {'action': 'complete'}, {'upload_id': upload_id})
+    assert response['statusCode'] == 422
+
+
+def test_reupload_of_same_content_is_deduplicated(call):
+    data = os.urandom(5000)
+    upload_id = _upload(call, data)
+    call('POST', {'action': 'complete'}, {'upload_id': upload_id})
+
+    response, created = call('POST', body={'filename': 'copy.bin', 'size': len(data), 'sha256': _manifest(data)})
+    assert response['statusCode'] == 201
+    assert created['deduplicated'] is True
+
+    response, content = call('GET', {'action': 'download', 'id': created['id']})
+    assert response['statusCode'] == 200
+    assert content == data
@@ -3,7 +3,9 @@ import os
 import psycopg2
 import psycopg2.extras
 from typing import Dict, Any
+from tracing import capture_trace
 
+@capture_trace('payments')
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
     API для управления оплатами по делам
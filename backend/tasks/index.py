@@ -3,7 +3,9 @@ import os
 import psycopg2
 from psycopg2.extras import RealDictCursor
 from typing import Dict, Any
+from tracing import capture_trace
 
+@capture_trace('tasks')
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
     API для работы с задачами: получение списка, создание, обновление статуса
@@ -0,0 +1,65 @@
+-- ХРАНИЛИЩЕ ДОКУМЕНТОВ (Content-addressed document storage)
+
+-- Чанки содержимого, адресуемые по SHA-256 (одинаковые чанки хранятся один раз)
+CREATE TABLE document_chunks (
+    sha256 CHAR(64) PRIMARY KEY,
+    size INTEGER NOT NULL,
+    storage_path TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Содержимое файла, адресуемое хешем манифеста: SHA-256 от последовательности SHA-256 его чанков
+CREATE TABLE document_contents (
+    sha256 CHAR(64) PRIMARY KEY,
+    size BIGINT NOT NULL,
+    chunk_size INTEGER NOT NULL,
+    chunks_count INTEGER NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Манифест: из каких чанков состоит содержимое
+CREATE TABLE document_content_chunks (
+    content_sha256 CHAR(64) NOT NULL REFERENCES document_contents(sha256),
+    chunk_index INTEGER NOT NULL,
+    chunk_sha256 CHAR(64) NOT NULL REFERENCES document_chunks(sha256),
+    PRIMARY KEY (content_sha256, chunk_index)
+);
+
+-- Сессии возобновляемой загрузки
+CREATE TABLE document_uploads (
+    id VARCHAR(36) PRIMARY KEY,
+    filename VARCHAR(255) NOT NULL,
+    original_name VARCHAR(255),
+    mime_type VARCHAR(100),
+    size BIGINT NOT NULL,
+    chunk_size INTEGER NOT NULL,
+    sha256 CHAR(64), -- заявленный клиентом хеш манифеста, проверяется при завершении
+    description TEXT,
+    category VARCHAR(100),
+    case_id INTEGER REFERENCES cases(id),
+    task_id INTEGER REFERENCES tasks(id),
+    uploaded_by INTEGER REFERENCES users(id),
+    previous_document_id INTEGER REFERENCES documents(id), -- загрузка новой версии
+    status VARCHAR(50) NOT NULL DEFAULT 'в процессе' CHECK (status IN ('в процессе', 'завершена')),
+    document_id INTEGER REFERENCES documents(id),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    completed_at TIMESTAMP
+);
+
+-- Полученные чанки загрузки
+CREATE TABLE document_upload_parts (
+    upload_id VARCHAR(36) NOT NULL REFERENCES document_uploads(id),
+    chunk_index INTEGER NOT NULL,
+    chunk_sha256 CHAR(64) NOT NULL REFERENCES document_chunks(sha256),
+    received_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (upload_id, chunk_index)
+);
+
+-- Связь документа с содержимым и предыдущей версией
+ALTER TABLE documents ADD COLUMN content_sha256 CHAR(64) REFERENCES document_contents(sha256);
+ALTER TABLE documents ADD COLUMN previous_version_id INTEGER REFERENCES documents(id);
+
+CREATE INDEX idx_documents_task ON documents(task_id);
+CREATE INDEX idx_documents_content ON documents(content_sha256);
+CREATE INDEX idx_documents_previous_version ON documents(previous_version_id);
+CREATE INDEX idx_document_content_chunks_chunk ON document_content_chunks(chunk_sha256);
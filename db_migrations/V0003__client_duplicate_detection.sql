@@ -0,0 +1,32 @@
+-- ПОИСК ДУБЛЕЙ КЛИЕНТОВ (Client duplicate detection)
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Нормализация реквизитов: только цифры (пробелы, дефисы и т.п. отбрасываются)
+CREATE OR REPLACE FUNCTION client_digits_key(value TEXT) RETURNS TEXT AS $$
+    SELECT NULLIF(regexp_replace(value, '\D', '', 'g'), '')
+$$ LANGUAGE SQL IMMUTABLE;
+
+-- Нормализация имени: нижний регистр, без кавычек, организационно-правовой формы и лишних пробелов
+CREATE OR REPLACE FUNCTION client_name_key(value TEXT) RETURNS TEXT AS $$
+    SELECT btrim(regexp_replace(
+        regexp_replace(
+            regexp_replace(lower(value), '[«»"''`]', ' ', 'g'),
+            '(^|\s)(ооо|оао|зао|пао|ао|ип|нко|ано|гуп|муп|фгуп)(\s|$)', ' ', 'g'
+        ),
+        '\s+', ' ', 'g'
+    ))
+$$ LANGUAGE SQL IMMUTABLE;
+
+-- Частичные индексы для точного совпадения реквизитов.
+-- Не уникальные: в таблице уже могут быть дубли, их разбирает пакетный поиск и слияние
+CREATE INDEX idx_clients_inn_key ON clients (client_digits_key(inn)) WHERE inn IS NOT NULL;
+CREATE INDEX idx_clients_ogrn_key ON clients (client_digits_key(ogrn)) WHERE ogrn IS NOT NULL;
+CREATE INDEX idx_clients_passport_key ON clients (client_digits_key(passport_series_number))
+    WHERE passport_series_number IS NOT NULL;
+
+-- Триграммный индекс для поиска похожих имен
+CREATE INDEX idx_clients_name_trgm ON clients
+    USING GIN (client_name_key(COALESCE(full_name, company_name)) gin_trgm_ops);
+
+CREATE INDEX idx_payments_client ON payments(client_id);
@@ -0,0 +1,52 @@
+-- АНАЛИТИКА НАГРУЗКИ ЮРИСТОВ: время обновления хранится отдельно от строк представления,
+-- иначе REFRESH ... CONCURRENTLY считает измененными все строки и переписывает представление целиком
+
+CREATE TABLE materialized_view_refreshes (
+    view_name VARCHAR(100) PRIMARY KEY,
+    refreshed_at TIMESTAMP NOT NULL
+);
+
+DROP MATERIALIZED VIEW lawyer_workload;
+
+CREATE MATERIALIZED VIEW lawyer_workload AS
+SELECT
+    u.id AS user_id,
+    u.full_name,
+    u.role,
+    COALESCE(t.open_tasks, 0) AS open_tasks,
+    COALESCE(t.overdue_tasks, 0) AS overdue_tasks,
+    COALESCE(t.completed_tasks, 0) AS completed_tasks,
+    COALESCE(t.completed_late_tasks, 0) AS completed_late_tasks,
+    t.avg_completion_delay_days,
+    t.p90_completion_delay_days,
+    COALESCE(c.active_cases, 0) AS active_cases
+FROM users u
+LEFT JOIN (
+    SELECT
+        assigned_to,
+        COUNT(*) FILTER (WHERE status <> 'выполнена') AS open_tasks,
+        COUNT(*) FILTER (
+            WHERE status <> 'выполнена'
+              AND (status = 'просрочена' OR due_date < CURRENT_TIMESTAMP)
+        ) AS overdue_tasks,
+        COUNT(*) FILTER (WHERE status = 'выполнена') AS completed_tasks,
+        COUNT(*) FILTER (WHERE status = 'выполнена' AND actual_date > due_date) AS completed_late_tasks,
+        ROUND((AVG(EXTRACT(EPOCH FROM actual_date - due_date) / 86400)
+            FILTER (WHERE status = 'выполнена'))::numeric, 2) AS avg_completion_delay_days,
+        ROUND((PERCENTILE_CONT(0.9) WITHIN GROUP (ORDER BY EXTRACT(EPOCH FROM actual_date - due_date) / 86400)
+            FILTER (WHERE status = 'выполнена'))::numeric, 2) AS p90_completion_delay_days
+    FROM tasks
+    WHERE assigned_to IS NOT NULL
+    GROUP BY assigned_to
+) t ON t.assigned_to = u.id
+LEFT JOIN (
+    SELECT responsible_user_id, COUNT(*) AS active_cases
+    FROM cases
+    WHERE status IN ('открыто', 'в работе', 'на паузе')
+    GROUP BY responsible_user_id
+) c ON c.responsible_user_id = u.id;
+
+-- Уникальный индекс обязателен для REFRESH ... CONCURRENTLY
+CREATE UNIQUE INDEX idx_lawyer_workload_user ON lawyer_workload(user_id);
+
+INSERT INTO materialized_view_refreshes (view_name, refreshed_at) VALUES ('lawyer_workload', CURRENT_TIMESTAMP);
@@ -134,6 +134,16 @@ const EditClientDialog = ({ client, onSuccess, trigger }: EditClientDialogProps)
         if (onSuccess) {
           onSuccess();
         }
+      } else if (response.status === 409) {
+        const data = await response.json();
+        const matches = data.exact_matches
+          .map((match: { full_name: string | null; company_name: string | null }) => match.full_name || match.company_name)
+          .join(', ');
+        toast({
+          title: 'Клиент уже существует',
+          description: `Совпадают реквизиты с клиентами: ${matches}`,
+          variant: 'destructive'
+        });
       } else {
         throw new Error('Ошибка обновления клиента');
       }
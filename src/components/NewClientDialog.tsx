@@ -7,6 +7,7 @@ import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from '@
 import { Textarea } from '@/components/ui/textarea';
 import Icon from '@/components/ui/icon';
 import { toast } from '@/components/ui/use-toast';
+import { ToastAction } from '@/components/ui/toast';
 
 interface NewClientDialogProps {
   onSuccess?: () => void;
@@ -52,6 +53,10 @@ const NewClientDialog = ({ onSuccess, trigger }: NewClientDialogProps) => {
       return;
     }
 
+    await createClient(false);
+  };
+
+  const createClient = async (force: boolean) => {
     setLoading(true);
 
     try {
@@ -75,7 +80,8 @@ const NewClientDialog = ({ onSuccess, trigger }: NewClientDialogProps) => {
           kpp: formData.kpp || null,
           ogrn: formData.ogrn || null,
           legal_address: formData.legal_address || null
-        })
+        }),
+        ...(force ? { force: true } : {})
       };
 
       const response = await fetch('https://functions.poehali.dev/e47a5187-bd9e-4e30-9749-5aaf274af1f5', {
@@ -111,6 +117,28 @@ const NewClientDialog = ({ onSuccess, trigger }: NewClientDialogProps) => {
         if (onSuccess) {
           onSuccess();
         }
+      } else if (response.status === 409) {
+        const data = await response.json();
+        const names = (clients: { full_name: string | null; company_name: string | null }[]) =>
+          clients.map(client => client.full_name || client.company_name).join(', ');
+
+        if (data.exact_matches.length > 0) {
+          toast({
+            title: 'Клиент уже существует',
+            description: `Совпадают реквизиты с клиентами: ${names(data.exact_matches)}`,
+            variant: 'destructive'
+          });
+        } else {
+          toast({
+            title: 'Найдены похожие клиенты',
+            description: `Проверьте, не дубль ли это: ${names(data.similar_matches)}`,
+            action: (
+              <ToastAction altText="Создать всё равно" onClick={() => createClient(true)}>
+                Создать всё равно
+              </ToastAction>
+            )
+          });
+        }
       } else {
         throw new Error('Ошибка создания клиента');
       }
@@ -0,0 +1,334 @@
+'''
+Нагрузочное воспроизведение записанной трассы запросов против обработчиков backend/*/index.py
+
+Трасса записывается самими функциями: на платформе задайте TRACE_CAPTURE=1 и выгрузите логи функций
+(строки с префиксом TRACE_MARKER, прочий вывод пропускается), локально - TRACE_CAPTURE_PATH=/path/trace.jsonl.
+Запуск: python tools/load_replay.py trace.jsonl --database-url postgresql://... --concurrency 8 --speed 10
+'''
+import argparse
+import importlib.util
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+import psycopg2
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+SIBLING_MODULES = ('index', 'storage', 'tracing')
+HISTOGRAM_BOUNDS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+STATUS_CLASSES = ('2xx', '3xx', '4xx', '5xx', 'error')
+TRACE_MARKER = 'TRACE '
+MAX_CLIENT_ERROR_SHARE = 0.1
+
+_handlers: Dict[str, Callable] = {}
+
+
+def load_handler(function_name: str) -> Callable:
+    '''
+    Импортирует handler функции так же, как платформа: каталог функции в sys.path,
+    соседние модули (storage, tracing) берутся из этого же каталога
+    '''
+    function_dir = os.path.join(BACKEND_DIR, function_name)
+    for name in SIBLING_MODULES:
+        sys.modules.pop(name, None)
+    sys.path.insert(0, function_dir)
+    try:
+        spec = importlib.util.spec_from_file_location(f'replay_{function_name}', os.path.join(function_dir, 'index.py'))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    finally:
+        sys.path.remove(function_dir)
+    return module.handler
+
+
+def _init_worker(function_names: List[str]) -> None:
+    for function_name in function_names:
+        _handlers[function_name] = load_handler(function_name)
+
+
+def _replay_event(record: Dict[str, Any]) -> Dict[str, Any]:
+    event = {
+        'httpMethod': record['method'],
+        'path': record.get('path', '/'),
+        'queryStringParameters': record.get('query') or {},
+        'headers': record.get('headers') or {},
+        'body': record.get('body'),
+        'isBase64Encoded': record.get('isBase64Encoded', False)
+    }
+    started = time.perf_counter()
+    try:
+        response = _handlers[record['function']](event, None)
+        status, error = response.get('statusCode'), None
+    except Exception as e:
+        status, error = None, f'{type(e).__name__}: {e}'
+    return {
+        'service_ms': (time.perf_counter() - started) * 1000,
+        'status': status,
+        'error': error,
+        'pid': os.getpid()
+    }
+
+
+class ConnectionSampler(threading.Thread):
+    '''
+    Периодически считает соединения к базе в pg_stat_activity, не учитывая собственное
+    '''
+
+    def __init__(self, database_url: str, interval: float):
+        super().__init__(daemon=True)
+        self.database_url = database_url
+        self.interval = interval
+        self.samples: List[Dict[str, int]] = []
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        conn = psycopg2.connect(self.database_url)
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cur:
+                while not self._stop_event.is_set():
+                    cur.execute('''
+                        SELECT COALESCE(state, 'unknown'), COUNT(*)
+                        FROM pg_stat_activity
+                        WHERE datname = current_database() AND pid <> pg_backend_pid()
+                        GROUP BY 1
+                    ''')
+                    self.samples.append(dict(cur.fetchall()))
+                    self._stop_event.wait(self.interval)
+        finally:
+            conn.close()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+    def summary(self) -> Dict[str, Any]:
+        totals = [sum(sample.values()) for sample in self.samples] or [0]
+        active = [sample.get('active', 0) for sample in self.samples] or [0]
+        return {
+            'samples': len(self.samples),
+            'max_total': max(totals),
+            'mean_total': round(statistics.mean(totals), 2),
+            'max_active': max(active)
+        }
+
+
+def read_trace(path: str) -> List[Dict[str, Any]]:
+    '''
+    Читает JSONL-файл трассы или выгрузку логов: в логах запись начинается после TRACE_MARKER
+    (перед ним платформа может добавить время и уровень)
+    '''
+    records = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.lstrip().startswith('{'):
+                records.append(json.loads(line))
+                continue
+            position = line.find(TRACE_MARKER)
+            if position >= 0:
+                records.append(json.loads(line[position + len(TRACE_MARKER):]))
+    return sorted(records, key=lambda record: record.get('ts', 0))
+
+
+def endpoint_key(record: Dict[str, Any]) -> str:
+    key = f'{record["function"]} {record["method"]}'
+    action = (record.get('query') or {}).get('action')
+    return f'{key} action={action}' if action else key
+
+
+def replay(records: List[Dict[str, Any]], concurrency: int, speed: float) -> List[Dict[str, Any]]:
+    '''
+    Отправляет события в пул процессов, сохраняя интервалы трассы (ускоренные в speed раз;
+    speed=0 - без пауз). Задержка ответа считается от запланированного момента до завершения
+    '''
+    function_names = sorted({record['function'] for record in records})
+    results: List[Dict[str, Any]] = []
+    lock = threading.Lock()
+
+    with ProcessPoolExecutor(max_workers=concurrency, initializer=_init_worker, initargs=(function_names,)) as pool:
+        # Прогрев: процессы стартуют и импортируют обработчики до начала отсчета
+        for _ in pool.map(time.sleep, [0.1] * concurrency):
+            pass
+
+        first_ts = records[0].get('ts', 0)
+        started = time.perf_counter()
+        futures = []
+        for record in records:
+            offset = (record.get('ts', 0) - first_ts) / speed if speed > 0 else 0
+            delay = started + offset - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            scheduled = started + offset if speed > 0 else time.perf_counter()
+
+            def on_done(future: Future, record=record, scheduled=scheduled) -> None:
+                finished = time.perf_counter()
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {'service_ms': None, 'status': None, 'error': f'{type(e).__name__}: {e}', 'pid': None}
+                result['endpoint'] = endpoint_key(record)
+                result['recorded_status'] = record.get('status')
+                result['latency_ms'] = (finished - scheduled) * 1000
+                result['finished'] = finished - started
+                with lock:
+                    results.append(result)
+
+            future = pool.submit(_replay_event, record)
+            future.add_done_callback(on_done)
+            futures.append(future)
+
+        for future in futures:
+            future.exception()
+
+    return results
+
+
+def percentile(values: List[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered))) - 1))]
+
+
+def histogram(values: List[float]) -> Dict[str, int]:
+    buckets = {f'<={bound}ms': 0 for bound in HISTOGRAM_BOUNDS_MS}
+    buckets[f'>{HISTOGRAM_BOUNDS_MS[-1]}ms'] = 0
+    for value in values:
+        for bound in HISTOGRAM_BOUNDS_MS:
+            if value <= bound:
+                buckets[f'<={bound}ms'] += 1
+                break
+        else:
+            buckets[f'>{HISTOGRAM_BOUNDS_MS[-1]}ms'] += 1
+    return buckets
+
+
+def status_class(status: Any) -> str:
+    if not isinstance(status, int) or not 200 <= status < 600:
+        return 'error'
+    return f'{status // 100}xx'
+
+
+def build_report(results: List[Dict[str, Any]], skipped: int, connections: Dict[str, Any],
+                 max_client_error_share: float = MAX_CLIENT_ERROR_SHARE) -> Dict[str, Any]:
+    '''
+    Сводка по эндпоинтам. Ответы 4xx (несуществующие в локальной базе id, конфликты дублей)
+    обычно быстрее настоящих, поэтому их доля и расхождения с записанными статусами выносятся в warnings
+    '''
+    duration = max((result['finished'] for result in results), default=0) or 1e-9
+    endpoints = {}
+    warnings = []
+    for key in sorted({result['endpoint'] for result in results}):
+        rows = [result for result in results if result['endpoint'] == key]
+        latencies = [row['latency_ms'] for row in rows]
+        service = [row['service_ms'] for row in rows if row['service_ms'] is not None]
+        classes = {name: 0 for name in STATUS_CLASSES}
+        for row in rows:
+            classes[status_class(row['status'])] += 1
+        mismatches = sum(
+            1 for row in rows
+            if row['recorded_status'] is not None and status_class(row['status']) != status_class(row['recorded_status'])
+        )
+        client_error_share = classes['4xx'] / len(rows)
+        if client_error_share > max_client_error_share:
+            warnings.append(f'{key}: {client_error_share:.0%} ответов 4xx, задержки и пропускная способность занижены')
+        if mismatches:
+            warnings.append(f'{key}: у {mismatches} из {len(rows)} запросов класс статуса отличается от записанного')
+        endpoints[key] = {
+            'requests': len(rows),
+            'errors': classes['5xx'] + classes['error'],
+            'status_classes': classes,
+            'client_error_share': round(client_error_share, 3),
+            'status_mismatches': mismatches,
+            'throughput_rps': round(len(rows) / duration, 2),
+            'latency_ms': {
+                'p50': round(percentile(latencies, 50), 2),
+                'p90': round(percentile(latencies, 90), 2),
+                'p99': round(percentile(latencies, 99), 2),
+                'max': round(max(latencies), 2)
+            },
+            'service_p50_ms': round(percentile(service, 50), 2) if service else None,
+            'histogram': histogram(latencies)
+        }
+    return {
+        'requests': len(results),
+        'skipped': skipped,
+        'duration_s': round(duration, 3),
+        'throughput_rps': round(len(results) / duration, 2),
+        'db_connections': connections,
+        'endpoints': endpoints,
+        'warnings': warnings
+    }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f'requests: {report["requests"]} (skipped {report["skipped"]}), '
+          f'duration: {report["duration_s"]}s, throughput: {report["throughput_rps"]} rps')
+    connections = report['db_connections']
+    print(f'db connections: max {connections["max_total"]}, mean {connections["mean_total"]}, '
+          f'max active {connections["max_active"]} ({connections["samples"]} samples)')
+    print()
+    print(f'{"endpoint":<36}{"req":>7}{"2xx":>6}{"4xx":>6}{"5xx":>6}{"err":>6}{"rps":>9}'
+          f'{"p50":>10}{"p90":>10}{"p99":>10}{"max":>10}')
+    for key, stats in report['endpoints'].items():
+        latency = stats['latency_ms']
+        classes = stats['status_classes']
+        print(f'{key:<36}{stats["requests"]:>7}{classes["2xx"]:>6}{classes["4xx"]:>6}{classes["5xx"]:>6}'
+              f'{classes["error"]:>6}{stats["throughput_rps"]:>9}'
+              f'{latency["p50"]:>10}{latency["p90"]:>10}{latency["p99"]:>10}{latency["max"]:>10}')
+    if report['warnings']:
+        print()
+        for warning in report['warnings']:
+            print(f'WARNING {warning}')
+    for key, stats in report['endpoints'].items():
+        print()
+        print(key)
+        peak = max(stats['histogram'].values()) or 1
+        for bucket, count in stats['histogram'].items():
+            print(f'  {bucket:>10} {count:>7} {"#" * round(40 * count / peak)}')
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description='Воспроизведение трассы запросов против обработчиков функций')
+    parser.add_argument('trace', help='JSONL-файл трассы, записанный с TRACE_CAPTURE_PATH')
+    parser.add_argument('--database-url', default=os.environ.get('DATABASE_URL'), help='локальная база Postgres')
+    parser.add_argument('--concurrency', type=int, default=4, help='число процессов-обработчиков')
+    parser.add_argument('--speed', type=float, default=1.0, help='ускорение интервалов трассы; 0 - без пауз')
+    parser.add_argument('--sample-interval', type=float, default=0.5, help='период опроса pg_stat_activity, с')
+    parser.add_argument('--max-4xx-share', type=float, default=MAX_CLIENT_ERROR_SHARE,
+                        help='доля ответов 4xx на эндпоинт, выше которой выводится предупреждение')
+    parser.add_argument('--json', dest='json_path', help='сохранить отчет в JSON')
+    args = parser.parse_args(argv)
+
+    if not args.database_url:
+        parser.error('нужен --database-url или DATABASE_URL')
+
+    os.environ['DATABASE_URL'] = args.database_url
+    os.environ.pop('TRACE_CAPTURE_PATH', None)
+    os.environ.setdefault('STORAGE_BACKEND', 'local')
+
+    records = read_trace(args.trace)
+    replayable = [record for record in records if not record.get('body_omitted')]
+    if not replayable:
+        parser.error('в трассе нет событий для воспроизведения')
+
+    sampler = ConnectionSampler(args.database_url, args.sample_interval)
+    sampler.start()
+    try:
+        results = replay(replayable, args.concurrency, args.speed)
+    finally:
+        sampler.stop()
+
+    report = build_report(results, len(records) - len(replayable), sampler.summary(), args.max_4xx_share)
+    print_report(report)
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()